@@ -0,0 +1,101 @@
+#
+#  ngcf
+#  Node-based general computing framework.
+#  Copyright Patrick Huang 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Per-node overhead of input access on ``NodeLogicAnd`` chains.
+
+Compares the old linear ``get()`` scan, ``get()`` with the name map,
+and ``pass_values``, both for ``execute()`` alone and a whole tree.
+"""
+
+import os
+import sys
+import time
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import ngcf
+import default_nodes
+
+
+class NodeLinearGet(ngcf.Node):
+    """AND node with the name lookup ``get()`` had before the name map."""
+    inputs = (
+        ngcf.SocketBool(name="A"),
+        ngcf.SocketBool(name="B"),
+    )
+    outputs = (
+        ngcf.SocketBool(name="Output"),
+    )
+
+    def get(self, name):
+        for inp in self.inputs:
+            if inp.name == name:
+                return inp.value
+        raise ValueError(f"No input socket with name {name}")
+
+    def execute(self):
+        return (self.get("A") and self.get("B"),)
+
+
+class NodeMapGet(ngcf.Node):
+    """AND node using ``get()``."""
+    inputs = NodeLinearGet.inputs
+    outputs = NodeLinearGet.outputs
+
+    def execute(self):
+        return (self.get("A") and self.get("B"),)
+
+
+def bench_execute(node, number=200000, repeat=7):
+    if node.pass_values:
+        args = [inp.value for inp in node.inputs]
+        func = lambda: node.execute(*args)
+    else:
+        func = lambda: node.execute()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def bench_tree(cls, n=2000, repeat=50):
+    tree = ngcf.NodeTree(max_undo=0)
+    with tree.batch():
+        ids = tree.add_nodes(cls() for _ in range(n))
+        tree.connect_many((ids[i], 0, ids[i+1], 0) for i in range(n-1))
+    for node in tree.nodes:
+        for inp in node.inputs:
+            inp.gui_value = True
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tree.execute()
+        best = min(best, time.perf_counter() - start)
+    return best / n
+
+
+def main():
+    default_nodes.register()
+    print(f"{'node':<16}{'execute() ns':>14}{'tree us/node':>14}")
+    for label, cls in (("linear get()", NodeLinearGet), ("map get()", NodeMapGet),
+            ("pass_values", ngcf.NodeLogicAnd)):
+        print(f"{label:<16}{bench_execute(cls())*1e9:>14.0f}{bench_tree(cls)*1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#
+#  ngcf
+#  Node-based general computing framework.
+#  Copyright Patrick Huang 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Iterating a 20-node ``NodeLogicXor`` chain: an outer Python loop which
+sets a ``gui_value`` and calls ``execute()`` each iteration, against
+``NodeRepeat`` running the same chain inside the graph.
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import ngcf
+import default_nodes
+
+
+def xor_chain(n=20):
+    tree = ngcf.NodeTree(max_undo=0)
+    with tree.batch():
+        ids = tree.add_nodes(ngcf.NodeLogicXor() for _ in range(n))
+        tree.connect_many((ids[i], 0, ids[i+1], 0) for i in range(n-1))
+    for id_num in ids:
+        tree.get_node_by_id(id_num).inputs[1].gui_value = True
+    return tree, ids
+
+
+def outer_loop(iterations):
+    tree, ids = xor_chain()
+    first = tree.get_node_by_id(ids[0])
+    last = tree.get_node_by_id(ids[-1])
+    value = False
+    start = time.perf_counter()
+    for _ in range(iterations):
+        first.inputs[0].gui_value = value
+        tree.execute()
+        value = last.outputs[0].value
+    return time.perf_counter() - start, value
+
+
+def in_graph(iterations):
+    body, ids = xor_chain()
+    tree = ngcf.NodeTree(max_undo=0)
+    id_num = tree.add_node(ngcf.NodeRepeat(body, [((ids[0], 0), (ids[-1], 0))]))
+    node = tree.get_node_by_id(id_num)
+    node.inputs[0].gui_value = iterations
+    start = time.perf_counter()
+    tree.execute()
+    return time.perf_counter() - start, node.outputs[0].value
+
+
+def main():
+    default_nodes.register()
+    iterations = 2000
+    for label, func in (("outer loop", outer_loop), ("NodeRepeat", in_graph)):
+        elapsed, value = min(func(iterations) for _ in range(5))
+        print(f"{label:<12}{elapsed/iterations*1e6:>8.1f} us/iteration  (result {value})")
+
+
+if __name__ == "__main__":
+    main()
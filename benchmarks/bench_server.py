@@ -0,0 +1,113 @@
+#
+#  ngcf
+#  Node-based general computing framework.
+#  Copyright Patrick Huang 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+Load generator for ``TreeServer``.
+
+Starts a server process on a Unix socket serving ``NodeLogicAnd``
+chains, sends requests from client threads in this process and reports
+p50 and p99 latency and throughput.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+import ngcf
+import default_nodes
+
+TREES = ("100", "200", "300", "400")
+
+
+def load(name):
+    tree = ngcf.NodeTree(max_undo=0)
+    n = int(name)
+    with tree.batch():
+        ids = tree.add_nodes(ngcf.NodeLogicAnd() for _ in range(n))
+        tree.connect_many((ids[i], 0, ids[i+1], 0) for i in range(n-1))
+    return tree
+
+
+def serve(path, workers):
+    default_nodes.register()
+    ngcf.TreeServer(load, workers=workers).serve(path)
+
+
+def client(path, k, count, latencies, lock):
+    for i in range(count):
+        start = time.perf_counter()
+        ngcf.send_request(path, TREES[(k+i) % len(TREES)], [(0, 0, i % 2 == 0)])
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", help="Run the server on this socket path.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=250, help="Requests per client.")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.workers)
+        return
+
+    path = os.path.join(tempfile.mkdtemp(), "ngcf.sock")
+    proc = subprocess.Popen([sys.executable, __file__, "--serve", path, "--workers", str(args.workers)])
+    try:
+        while True:
+            try:
+                for name in TREES:
+                    ngcf.send_request(path, name)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                time.sleep(0.05)
+
+        latencies = []
+        lock = threading.Lock()
+        threads = [threading.Thread(target=client, args=(path, k, args.requests, latencies, lock))
+            for k in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    latencies.sort()
+    p50 = latencies[len(latencies)//2]
+    p99 = latencies[int(len(latencies)*0.99)]
+    print(f"{len(latencies)} requests: p50 {p50*1e3:.2f} ms, p99 {p99*1e3:.2f} ms, "
+        f"{len(latencies)/elapsed:.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
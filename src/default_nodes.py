@@ -31,9 +31,10 @@ class NodeLogicAnd(Node):
     )
     name = "AND"
     category = "Logic"
+    pass_values = True
 
-    def execute(self):
-        return (self.get("A") and self.get("B"))
+    def execute(self, a, b):
+        return (a and b,)
 
 class NodeLogicOr(Node):
     inputs = (
@@ -45,9 +46,10 @@ class NodeLogicOr(Node):
     )
     name = "OR"
     category = "Logic"
+    pass_values = True
 
-    def execute(self):
-        return (self.get("A") or self.get("B"))
+    def execute(self, a, b):
+        return (a or b,)
 
 class NodeLogicXor(Node):
     inputs = (
@@ -59,9 +61,10 @@ class NodeLogicXor(Node):
     )
     name = "XOR"
     category = "Logic"
+    pass_values = True
 
-    def execute(self):
-        return (self.get("A") != self.get("B"))
+    def execute(self, a, b):
+        return (a != b,)
 
 class NodeLogicNot(Node):
     inputs = (
@@ -72,9 +75,10 @@ class NodeLogicNot(Node):
     )
     name = "NOT"
     category = "Logic"
+    pass_values = True
 
-    def execute(self):
-        return (not self.get("A"))
+    def execute(self, a):
+        return (not a,)
 
 
 classes = (
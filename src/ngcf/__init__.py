@@ -17,6 +17,10 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
+from .cache import *
+from .loops import *
 from .nodes import *
+from .server import *
+from .snapshot import *
 from .sockets import *
 from .utils import *
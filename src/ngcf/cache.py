@@ -0,0 +1,214 @@
+#
+#  ngcf
+#  Node-based general computing framework.
+#  Copyright Patrick Huang 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+__all__ = (
+    "DiskCache",
+)
+
+import hashlib
+import os
+import pickle
+import tempfile
+import types
+import weakref
+from typing import Any, NamedTuple, Optional, Sequence, Tuple
+
+_code_digests: "weakref.WeakKeyDictionary[type, str]" = weakref.WeakKeyDictionary()
+
+
+class DiskCache:
+    """
+    Content-addressed on-disk cache of node outputs.
+
+    Pass one to ``NodeTree.execute(cache=...)``. Entries survive process
+    restarts, so unchanged nodes are not executed again.
+    Several processes may share one directory.
+    """
+    path: str
+    max_size: int
+
+    # Eviction removes entries until the size is this fraction of max_size.
+    low_water = 0.9
+
+    def __init__(self, path: str, max_size: int = int(1e9)) -> None:
+        """
+        :param path: Cache directory. Created if it doesn't exist.
+        :param max_size: Maximum total size of entries in bytes.
+            The least recently used entries are removed past this.
+        """
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(path, exist_ok=True)
+        self.evict()
+
+    @staticmethod
+    def key(node: Any, inputs: Sequence[Any]) -> str:
+        """
+        Compute a node's cache key.
+
+        :param node: The node.
+        :param inputs: One item per input socket: the input value, or
+            ``(upstream_key, socket_num)`` for connected inputs.
+        """
+        cls = node.__class__
+        digest = _code_digests.get(cls)
+        if digest is None:
+            digest = _code_digests[cls] = _code_digest(cls.execute.__code__).hexdigest()
+
+        data = (cls.__module__, cls.__qualname__, cls.version, digest, node.cache_data(), tuple(inputs))
+        return hashlib.sha256(pickle.dumps(_stable(data), protocol=4)).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[Any, ...]]:
+        """
+        Get the output values stored under a key.
+
+        :return: The outputs, or None if there is no entry.
+        """
+        path = self._file(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Missing or evicted by another process.
+            return None
+
+        try:
+            return pickle.loads(data)
+        except Exception:
+            # Corrupt, or refers to a class which was renamed or removed,
+            # e.g. by reload_nodes().
+            return None
+
+    def set(self, key: str, values: Tuple[Any, ...]) -> None:
+        """
+        Store output values under a key.
+        """
+        path = self._file(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        data = pickle.dumps(tuple(values), protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Write to a temporary file and rename it so that readers in
+        # other processes never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        # Other processes write to the directory too, so the size is
+        # only known after a scan. Scan again once this process alone
+        # could have filled the space freed by the last eviction.
+        self._written += len(data)
+        if self._written > self.max_size * (1-self.low_water):
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Scan the directory, and if it is larger than ``max_size``, remove
+        the least recently used entries until it is ``low_water`` of that.
+        """
+        entries = sorted(self._entries())
+        self._written = 0
+        size = sum(size for _, _, size in entries)
+        if size <= self.max_size:
+            return
+
+        for _, path, entry_size in entries:
+            if size <= self.max_size * self.low_water:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        for _, path, _ in self._entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._written = 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key+".pkl")
+
+    def _entries(self):
+        """
+        Yields ``(mtime, path, size)`` of each entry.
+        """
+        for directory in os.scandir(self.path):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield (stat.st_mtime, entry.path, stat.st_size)
+
+
+def _code_digest(code: types.CodeType) -> Any:
+    """
+    Hash a function's bytecode, so changing ``execute()`` changes the
+    node's cache keys.
+    """
+    digest = hashlib.sha256(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            digest.update(_code_digest(const).digest())
+        else:
+            digest.update(repr(_stable(const)).encode())
+    return digest
+
+
+class _Unordered(NamedTuple):
+    """
+    A set or dict in ``_stable()``'s result. Pickled with its class
+    name, so it never hashes like a tuple given as a value.
+    """
+    kind: str
+    items: Tuple[Any, ...]
+
+
+def _stable(value: Any) -> Any:
+    """
+    Replace sets and dicts with sorted tuples. The iteration order of a
+    set of strings depends on the process's hash seed, which would give
+    the same value a different cache key in each process.
+    """
+    if isinstance(value, (set, frozenset)):
+        items = sorted((_stable(v) for v in value), key=repr)
+        return _Unordered(type(value).__name__, tuple(items))
+    if isinstance(value, dict):
+        items = sorted(((_stable(k), _stable(v)) for k, v in value.items()), key=repr)
+        return _Unordered("dict", tuple(items))
+    if type(value) in (tuple, list):
+        return type(value)(_stable(v) for v in value)
+    return value
@@ -0,0 +1,145 @@
+#
+#  ngcf
+#  Node-based general computing framework.
+#  Copyright Patrick Huang 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+__all__ = (
+    "NodeRepeat",
+)
+
+import copy
+from typing import Any, Optional, Sequence, Tuple
+from .nodes import Node, NodeTree
+from .snapshot import TreeSnapshot
+from .sockets import SocketInt
+
+SocketRef = Tuple[int, int]
+
+
+class NodeRepeat(Node):
+    """
+    Runs a child tree repeatedly, feeding some of its outputs back into
+    its inputs.
+
+    Inputs are ``Iterations`` followed by the initial value of each state
+    input. Outputs are the final value of each state output followed by
+    ``Count``, the number of iterations that ran.
+    The child tree is planned once per execution and the state is passed
+    between iterations as evaluation overrides.
+    """
+    inputs = (
+        SocketInt(name="Iterations", default=1, min=0),
+    )
+    outputs = (
+        SocketInt(name="Count", min=0),
+    )
+    name = "Repeat"
+    category = "Loop"
+    pass_values = True
+
+    body: NodeTree
+    state: Sequence[Tuple[SocketRef, SocketRef]]
+    stop: Optional[SocketRef]
+    index: Optional[SocketRef]
+
+    # Set on the copies made for a TreeSnapshot.
+    body_snapshot: Optional[TreeSnapshot] = None
+
+    def __init__(self, body: NodeTree, state: Sequence[Tuple[SocketRef, SocketRef]],
+            stop: Optional[SocketRef] = None, index: Optional[SocketRef] = None) -> None:
+        """
+        Sockets are given as ``(node_id, socket_num)`` in the child tree.
+
+        :param body: Child tree run each iteration.
+        :param state: ``(input, output)`` pairs. Each iteration, the output's
+            value is passed to the input in the next iteration.
+        :param stop: Boolean output. The loop ends after an iteration
+            where it is True.
+        :param index: Integer input which receives the iteration number.
+        :raises ValueError: If a state input or the index input is connected.
+        """
+        super().__init__()
+        self.body = body
+        self.state = tuple(state)
+        self.stop = stop
+        self.index = index
+
+        state_inputs = []
+        state_outputs = []
+        for (in_id, in_num), (out_id, out_num) in self.state:
+            state_inputs.append(copy.copy(body.get_node_by_id(in_id).inputs[in_num]))
+            state_outputs.append(copy.copy(body.get_node_by_id(out_id).outputs[out_num]))
+        self._check_inputs(body.snapshot())
+        for sock in state_inputs + state_outputs:
+            sock.connection = None
+
+        self.inputs = self.inputs + tuple(state_inputs)
+        self.outputs = tuple(state_outputs) + self.outputs
+        self._input_map = {inp.name: i for i, inp in enumerate(self.inputs)}
+
+    def _check_inputs(self, snapshot: TreeSnapshot) -> None:
+        """
+        Check that the state inputs and index input are not connected,
+        as their values would be ignored.
+        """
+        refs = [inp for inp, _ in self.state]
+        if self.index is not None:
+            refs.append(self.index)
+        for node_id, num in refs:
+            step = snapshot.step(node_id)
+            if step is None:
+                raise ValueError(f"No node with ID {node_id}")
+            if step.sources[num] is not None:
+                raise ValueError(f"Input {num} of node {node_id} in the loop body is connected.")
+
+    def _freeze(self) -> Node:
+        node = super()._freeze()
+        node.body_snapshot = self.body.snapshot()
+        self._check_inputs(node.body_snapshot)
+        return node
+
+    def _frozen_current(self, frozen: Node) -> bool:
+        return frozen.body_snapshot is self.body.snapshot()
+
+    def _body(self) -> TreeSnapshot:
+        if self.body_snapshot is not None:
+            return self.body_snapshot
+        return self.body.snapshot()
+
+    def cache_data(self) -> Any:
+        # Keyed like the body's nodes themselves, so editing or reloading
+        # any of them changes this node's key.
+        keys = self._body().cache_keys()
+        return (tuple(keys.items()), self.state, self.stop, self.index)
+
+    def execute(self, iterations: int, *state: Any) -> Tuple[Any, ...]:
+        snapshot = self._body()
+        overrides = {}
+        count = 0
+        for i in range(iterations):
+            for (inp, _), value in zip(self.state, state):
+                overrides[inp] = value
+            if self.index is not None:
+                overrides[self.index] = i
+
+            ctx = snapshot.evaluate(overrides)
+            state = [ctx.get(*out) for _, out in self.state]
+            count += 1
+            if self.stop is not None and ctx.get(*self.stop):
+                break
+
+        return (*state, count)
@@ -22,7 +22,12 @@ __all__ = (
     "NodeTree",
 )
 
-from typing import Any, List, Sequence, Tuple
+import collections
+import contextlib
+import copy
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+from .cache import DiskCache
+from .snapshot import Step, TreeSnapshot
 from .sockets import Socket
 
 
@@ -38,12 +43,22 @@ class Node:
     * ``name``: Node name which will show up in the GUI.
     * ``category``: Node category.
     * ``execute()``: What the node will do.
+    * ``version``: Optional. Results stored in a ``DiskCache`` are
+      discarded when ``execute()`` changes. Increase this when the
+      results change for another reason, e.g. a helper function.
+    * ``pass_values``: Optional. If True, ``execute()`` receives the
+      input values as positional arguments.
     """
     inputs: Sequence[Socket]
     outputs: Sequence[Socket]
 
     name: str
     category: str
+    version: int = 0
+    pass_values: bool = False
+
+    # Input socket name to index, built when the node is registered.
+    _input_map: Dict[str, int]
 
     # Updated by node tree and/or GUI
     id_num: int
@@ -55,36 +70,202 @@ class Node:
     def __init__(self):
         self.selected = False
         self.loc = [0, 0]
+        if "_input_map" not in type(self).__dict__:
+            type(self)._build_input_map()
+
+        # Sockets are defined on the class, each instance needs its own.
+        self.inputs = tuple(copy.copy(s) for s in self.inputs)
+        self.outputs = tuple(copy.copy(s) for s in self.outputs)
+
+    @classmethod
+    def _build_input_map(cls) -> None:
+        cls._input_map = {inp.name: i for i, inp in enumerate(cls.inputs)}
 
-    def get(self, name: str) -> Socket:
+    def get(self, name: str) -> Any:
         """
         Get an input value by name.
         """
-        for inp in self.inputs:
-            if inp.name == name:
-                return inp.value
-        raise ValueError(f"No input socket with name {name}")
+        try:
+            return self.inputs[self._input_map[name]].value
+        except KeyError:
+            raise ValueError(f"No input socket with name {name}") from None
 
-    def execute(self) -> Tuple[Any, ...]:
+    def execute(self, *values: Any) -> Tuple[Any, ...]:
         """
         Compute the output values.
         The input values are guarenteed to be set correctly.
-        Access them by name with ``self.get(name)``
+        Access them by name with ``self.get(name)``, or if ``pass_values``
+        is set, take them as arguments in socket order.
         Return the outputs as a tuple.
         The node tree will handle the rest.
         """
         raise NotImplementedError("The default implementation cannot be used.")
 
+    def cache_data(self) -> Any:
+        """
+        Extra data which identifies this node's results in a ``DiskCache``,
+        along with its class and input values.
+        Override this if the results depend on anything else.
+        """
+        return None
+
+    def _freeze(self) -> "Node":
+        """
+        Copy this node for a ``TreeSnapshot``. The copy has its own
+        sockets and keeps its class if this node's class is replaced.
+        """
+        node = object.__new__(type(self))
+        node.__dict__.update(self.__dict__)
+        node.inputs = tuple(copy.copy(inp) for inp in self.inputs)
+        node.outputs = tuple(copy.copy(out) for out in self.outputs)
+        return node
+
+    def _frozen_current(self, frozen: "Node") -> bool:
+        """
+        Whether a copy from ``_freeze()`` can still be used, given that
+        the inputs and connections are unchanged.
+        """
+        return True
+
+    def _run(self, values: Sequence[Any]) -> Tuple[Any, ...]:
+        """
+        Call ``execute()`` with the given input values, without changing
+        this node's sockets.
+        """
+        if self.pass_values:
+            return self.execute(*values)
+
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view.inputs = tuple([_InputView(inp, v) for inp, v in zip(self.inputs, values)])
+        return view.execute()
+
+
+class _InputView:
+    """
+    Stands in for an input socket while a node runs, holding a value
+    without changing the socket.
+    """
+    __slots__ = ("socket", "value")
+
+    def __init__(self, socket: Socket, value: Any) -> None:
+        self.socket = socket
+        self.value = value
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.socket, name)
+
 
 class NodeTree:
     """
     A node tree manager.
+
+    Every edit is recorded in a change log, which ``undo()`` and
+    ``redo()`` step through. Group edits with ``batch()`` to validate
+    the tree once for all of them.
     """
     nodes: List[Node]
+    revision: int
 
-    def __init__(self):
+    # Batches with more connections than this are checked for cycles
+    # by sorting the whole tree instead of searching from each one.
+    max_cycle_checks = 16
+
+    def __init__(self, max_undo: Optional[int] = 100):
+        """
+        :param max_undo: Number of undo steps kept. Use 0 for trees that
+            are built by code and never undone, None for no limit.
+        """
         self.nodes = []
         self.next_id = 0
+        self.revision = 0
+
+        self._by_id: Dict[int, Node] = {}
+        self._indices: Optional[Dict[int, int]] = {}
+        self._log: Optional[List[Tuple]] = None
+        self._undo_stack: Deque[List[Tuple]] = collections.deque(maxlen=max_undo)
+        self._redo_stack: Deque[List[Tuple]] = collections.deque(maxlen=max_undo)
+        self._plan: Optional[Tuple[int, List[Node]]] = None
+        self._snapshot: Optional[TreeSnapshot] = None
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager which applies all edits inside it as one
+        transaction. The tree is checked for cycles once at the end,
+        and the whole batch is one undo step.
+        If an exception is raised inside, all edits are rolled back.
+
+        .. code-block:: python
+
+            with tree.batch():
+                a = tree.add_node(NodeLogicAnd())
+                b = tree.add_node(NodeLogicNot())
+                tree.make_connection(a, 0, b, 0)
+        """
+        if self._log is not None:
+            # Nested batch, joins the outer one.
+            yield
+            return
+
+        self._log = []
+        try:
+            yield
+            self._check_connections(self._log)
+        except BaseException:
+            log, self._log = self._log, None
+            for op in reversed(log):
+                self._do(self._inverse(op))
+            raise
+
+        log, self._log = self._log, None
+        if log:
+            self._undo_stack.append(log)
+            self._redo_stack.clear()
+            self.revision += 1
+
+    def undo(self) -> bool:
+        """
+        Revert the last edit or batch.
+
+        :return: Whether there was anything to undo.
+        """
+        if self._log is not None:
+            raise ValueError("Cannot undo inside a batch.")
+        if not self._undo_stack:
+            return False
+
+        log = self._undo_stack.pop()
+        for op in reversed(log):
+            self._do(self._inverse(op))
+        self._redo_stack.append(log)
+        self.revision += 1
+        return True
+
+    def redo(self) -> bool:
+        """
+        Apply the last undone edit or batch again.
+
+        :return: Whether there was anything to redo.
+        """
+        if self._log is not None:
+            raise ValueError("Cannot redo inside a batch.")
+        if not self._redo_stack:
+            return False
+
+        log = self._redo_stack.pop()
+        for op in log:
+            self._do(op)
+        self._undo_stack.append(log)
+        self.revision += 1
+        return True
+
+    def clear_history(self) -> None:
+        """
+        Forget all undo and redo steps.
+        """
+        self._undo_stack.clear()
+        self._redo_stack.clear()
 
     def add_node(self, node: Node) -> int:
         """
@@ -94,51 +275,60 @@ class NodeTree:
         """
         id_num = self.next_id
         node.id_num = id_num
-        self.nodes.append(node)
+        with self.batch():
+            self._apply(("add", node, len(self.nodes)))
 
         self.next_id += 1
         return id_num
 
+    def add_nodes(self, nodes: Iterable[Node]) -> List[int]:
+        """
+        Add many nodes in one batch.
+
+        :return: The new nodes' ID numbers.
+        """
+        with self.batch():
+            return [self.add_node(node) for node in nodes]
+
     def rm_node(self, id_num: int) -> None:
         """
         Removes node and all it's connections.
         """
-        ind = self.get_node_index_by_id(id_num)
-        node = self.nodes[ind]
-
-        for inp in node.inputs:
-            if inp.connection is not None:
-                i, sock = inp.connection
-                self.nodes[i].outputs[sock].connection = None
-        for out in node.outputs:
-            if out.connection is not None:
-                i, sock = out.connection
-                self.nodes[i].inputs[sock].connection = None
-
-        self.nodes.pop(ind)
+        node = self.get_node_by_id(id_num)
+        with self.batch():
+            for i, inp in enumerate(node.inputs):
+                if inp.connection is not None:
+                    self._apply(("disconnect", *inp.connection, id_num, i))
+            for i, out in enumerate(node.outputs):
+                if out.connection is not None:
+                    self._apply(("disconnect", id_num, i, *out.connection))
+            self._apply(("rm", node, self.get_node_index_by_id(id_num)))
 
     def get_node_by_id(self, id_num: int) -> Node:
         """
         Get node by id number.
         """
-        for node in self.nodes:
-            if node.id_num == id_num:
-                return node
-        raise ValueError(f"No node with ID {id_num}")
+        try:
+            return self._by_id[id_num]
+        except KeyError:
+            raise ValueError(f"No node with ID {id_num}") from None
 
     def get_node_index_by_id(self, id_num: int) -> int:
         """
         Get node index by id number.
         """
-        for i, node in enumerate(self.nodes):
-            if node.id_num == id_num:
-                return i
-        raise ValueError(f"No node with ID {id_num}")
+        if self._indices is None:
+            self._indices = {node.id_num: i for i, node in enumerate(self.nodes)}
+        try:
+            return self._indices[id_num]
+        except KeyError:
+            raise ValueError(f"No node with ID {id_num}") from None
 
     def make_connection(self, out_node_id: int, out_socket_num: int, in_node_id: int,
             in_socket_num: int) -> None:
         """
         Makes a connection between two nodes.
+        Existing connections on either socket are replaced.
 
         :param out_node_id: Output node id.
         :param out_socket_num: Output node socket number.
@@ -147,9 +337,26 @@ class NodeTree:
         """
         out_socket = self.get_node_by_id(out_node_id).outputs[out_socket_num]
         in_socket = self.get_node_by_id(in_node_id).inputs[in_socket_num]
+        if not in_socket.accepts(out_socket):
+            raise ValueError(f"Cannot connect {type(out_socket).__name__} to {type(in_socket).__name__}")
 
-        out_socket.connection = (in_node_id, in_socket_num)
-        in_socket.connection = (out_node_id, out_socket_num)
+        with self.batch():
+            if out_socket.connection is not None:
+                self._apply(("disconnect", out_node_id, out_socket_num, *out_socket.connection))
+            if in_socket.connection is not None:
+                self._apply(("disconnect", *in_socket.connection, in_node_id, in_socket_num))
+            self._apply(("connect", out_node_id, out_socket_num, in_node_id, in_socket_num))
+
+    def connect_many(self, connections: Iterable[Tuple[int, int, int, int]]) -> None:
+        """
+        Make many connections in one batch.
+
+        :param connections: ``(out_node_id, out_socket_num, in_node_id, in_socket_num)``
+            for each connection.
+        """
+        with self.batch():
+            for connection in connections:
+                self.make_connection(*connection)
 
     def rm_connection(self, out_node_id: int, out_socket_num: int, in_node_id: int,
             in_socket_num: int) -> None:
@@ -161,57 +368,293 @@ class NodeTree:
         :param in_node_id: Input node id.
         :param in_socket_num: Input node socket number.
         """
-        out_socket = self.get_node_by_id(out_node_id).outputs[out_socket_num]
         in_socket = self.get_node_by_id(in_node_id).inputs[in_socket_num]
+        if in_socket.connection != (out_node_id, out_socket_num):
+            raise ValueError("No such connection")
 
-        out_socket.connection = None
-        in_socket.connection = None
+        with self.batch():
+            self._apply(("disconnect", out_node_id, out_socket_num, in_node_id, in_socket_num))
 
-    def _exe_inp(self, ind: int, socket_num: int) -> None:
+    def replace_classes(self, classes: Dict[Type[Node], Type[Node]]) -> List[int]:
         """
-        Compute one input's value.
+        Change the class of nodes in place, e.g. after their module was
+        reloaded. Values and connections are kept for sockets whose name
+        is unchanged. The new class's ``__init__()`` isn't called.
+        Snapshots must not be taken meanwhile, for trees in a
+        ``TreeServer`` use ``TreeServer.reload()``.
+
+        :param classes: Old class to new class.
+        :return: IDs of the changed nodes.
+        """
+        if self._log is not None:
+            raise ValueError("Cannot replace classes inside a batch.")
 
-        :param ind: Node index, NOT the ID.
-        :param socket_num: Input socket index.
+        changed = []
+        layout_changed = False
+        for node in self.nodes:
+            cls = classes.get(type(node))
+            if cls is None:
+                continue
+
+            inputs = tuple(copy.copy(s) for s in cls.inputs)
+            outputs = tuple(copy.copy(s) for s in cls.outputs)
+            layout_changed |= (
+                [s.name for s in inputs] != [s.name for s in node.inputs] or
+                [s.name for s in outputs] != [s.name for s in node.outputs])
+
+            old_inputs = {inp.name: inp for inp in node.inputs}
+            for i, inp in enumerate(inputs):
+                old = old_inputs.pop(inp.name, None)
+                inp.connection = None
+                if old is None:
+                    continue
+                inp.value = old.value
+                inp.gui_value = old.gui_value
+                if old.connection is not None:
+                    out_id, out_num = old.connection
+                    out_socket = self._by_id[out_id].outputs[out_num]
+                    if inp.accepts(out_socket):
+                        inp.connection = old.connection
+                        out_socket.connection = (node.id_num, i)
+                    else:
+                        out_socket.connection = None
+            for old in old_inputs.values():
+                if old.connection is not None:
+                    out_id, out_num = old.connection
+                    self._by_id[out_id].outputs[out_num].connection = None
+
+            old_outputs = {out.name: out for out in node.outputs}
+            for i, out in enumerate(outputs):
+                old = old_outputs.pop(out.name, None)
+                out.connection = None
+                if old is None:
+                    continue
+                out.value = old.value
+                if old.connection is not None:
+                    in_id, in_num = old.connection
+                    in_socket = self._by_id[in_id].inputs[in_num]
+                    if in_socket.accepts(out):
+                        out.connection = old.connection
+                        in_socket.connection = (node.id_num, i)
+                    else:
+                        in_socket.connection = None
+            for old in old_outputs.values():
+                if old.connection is not None:
+                    in_id, in_num = old.connection
+                    self._by_id[in_id].inputs[in_num].connection = None
+
+            node.__class__ = cls
+            node.__dict__.pop("_input_map", None)
+            node.inputs = inputs
+            node.outputs = outputs
+            changed.append(node.id_num)
+
+        if changed:
+            if layout_changed:
+                # The change log refers to sockets by index.
+                self.clear_history()
+            self.revision += 1
+        return changed
+
+    def validate(self) -> None:
         """
-        inp = self.nodes[ind].inputs[socket_num]
-        if inp.connection is None:
-            inp.value = inp.gui_value
-        else:
-            node_id, num = inp.connection
-            node = self.get_node_by_id(node_id)
-            if not node.computed:
-                self._exe_node(self.get_node_index_by_id(node_id))
-            inp.set_value(node.outputs[num].value)
-        inp.computed = True
+        Check that the connections don't form a cycle.
 
-    def _exe_node(self, ind: int) -> None:
+        :raises ValueError: If they do.
         """
-        Compute one node's value.
+        self._order()
 
-        :param ind: Node index, NOT the ID.
+    def _check_connections(self, log: List[Tuple]) -> None:
         """
-        node = self.nodes[ind]
-        for i, inp in enumerate(node.inputs):
-            if not inp.computed:
-                self._exe_inp(ind, i)
+        Check that the connections made in a batch don't form a cycle.
+        A few connections are checked by searching downstream of each,
+        many by sorting the whole tree.
 
-        values = node.execute()
-        assert len(values) == len(node.outputs)
-        for i, v in enumerate(values):
-            node.outputs[i].set_value(v)
+        :raises ValueError: If they do.
+        """
+        connects = [op for op in log if op[0] == "connect"]
+        if len(connects) > self.max_cycle_checks:
+            self.validate()
+            return
+
+        for _, out_id, out_num, in_id, in_num in connects:
+            node = self._by_id.get(in_id)
+            if node is None or node.inputs[in_num].connection != (out_id, out_num):
+                # Removed later in the batch.
+                continue
+            if self._reaches(in_id, out_id):
+                raise ValueError("Connections form a cycle.")
+
+    def _reaches(self, start_id: int, target_id: int) -> bool:
+        """
+        Check whether a node is downstream of another.
+        """
+        stack = [start_id]
+        seen = {start_id}
+        while stack:
+            id_num = stack.pop()
+            if id_num == target_id:
+                return True
+            for out in self._by_id[id_num].outputs:
+                if out.connection is not None:
+                    next_id = out.connection[0]
+                    if next_id not in seen:
+                        seen.add(next_id)
+                        stack.append(next_id)
+        return False
+
+    def plan(self) -> List[Node]:
+        """
+        Get the nodes in execution order, each after the nodes connected
+        to its inputs. Cached until the tree is edited.
+        """
+        if self._log is not None:
+            # Inside a batch the revision hasn't changed yet.
+            return self._order()
+        if self._plan is None or self._plan[0] != self.revision:
+            self._plan = (self.revision, self._order())
+        return self._plan[1]
+
+    def _order(self) -> List[Node]:
+        """
+        Sort the nodes topologically.
+
+        :raises ValueError: If the connections form a cycle.
+        """
+        remaining = {}
+        order = []
+        for node in self.nodes:
+            count = sum(inp.connection is not None for inp in node.inputs)
+            remaining[node.id_num] = count
+            if count == 0:
+                order.append(node)
+
+        i = 0
+        while i < len(order):
+            for out in order[i].outputs:
+                if out.connection is not None:
+                    id_num = out.connection[0]
+                    remaining[id_num] -= 1
+                    if remaining[id_num] == 0:
+                        order.append(self._by_id[id_num])
+            i += 1
+
+        if len(order) != len(self.nodes):
+            raise ValueError("Connections form a cycle.")
+        return order
+
+    def _apply(self, op: Tuple) -> None:
+        """
+        Apply an edit and record it in the open batch.
+        """
+        self._do(op)
+        self._log.append(op)
+
+    def _do(self, op: Tuple) -> None:
+        """
+        Apply one edit from the change log.
+        """
+        kind = op[0]
+        if kind == "add":
+            _, node, ind = op
+            self.nodes.insert(ind, node)
+            self._by_id[node.id_num] = node
+            if self._indices is not None and ind == len(self.nodes) - 1:
+                self._indices[node.id_num] = ind
+            else:
+                self._indices = None
+
+        elif kind == "rm":
+            _, node, ind = op
+            self.nodes.pop(ind)
+            del self._by_id[node.id_num]
+            if self._indices is not None and ind == len(self.nodes):
+                del self._indices[node.id_num]
+            else:
+                self._indices = None
+
+        else:
+            _, out_id, out_num, in_id, in_num = op
+            out_socket = self._by_id[out_id].outputs[out_num]
+            in_socket = self._by_id[in_id].inputs[in_num]
+            if kind == "connect":
+                out_socket.connection = (in_id, in_num)
+                in_socket.connection = (out_id, out_num)
+            else:
+                out_socket.connection = None
+                in_socket.connection = None
+
+    @staticmethod
+    def _inverse(op: Tuple) -> Tuple:
+        inverses = {"add": "rm", "rm": "add", "connect": "disconnect", "disconnect": "connect"}
+        return (inverses[op[0]], *op[1:])
+
+    def snapshot(self) -> TreeSnapshot:
+        """
+        Get an immutable snapshot of the tree for evaluating.
 
-    def execute(self) -> None:
+        Each step holds a copy of its node, so later edits, including
+        ``replace_classes()``, don't affect the snapshot. Nodes which
+        haven't changed since the last snapshot share its steps, and an
+        unchanged tree returns the same snapshot.
+        """
+        # Read first, so a snapshot taken while another thread edits the
+        # tree is never stored under the revision after the edit.
+        revision = self.revision
+        prev = self._snapshot
+        in_batch = self._log is not None
+        if prev is not None and prev.revision == revision and not in_batch:
+            # Only input values can have changed.
+            steps = []
+            changed = False
+            for step in prev.steps:
+                node = step.origin
+                consts = tuple([None if inp.connection is not None else inp.gui_value
+                    for inp in node.inputs])
+                if consts != step.consts or not node._frozen_current(step.node):
+                    step = Step(node._freeze(), consts, step.sources, node)
+                    changed = True
+                steps.append(step)
+            if not changed:
+                return prev
+
+        else:
+            steps = []
+            for node in self.plan():
+                consts = tuple([None if inp.connection is not None else inp.gui_value
+                    for inp in node.inputs])
+                sources = tuple([inp.connection for inp in node.inputs])
+                step = None if prev is None else prev.step(node.id_num)
+                if (step is None or step.origin is not node or type(step.node) is not type(node) or
+                        step.consts != consts or step.sources != sources or
+                        not node._frozen_current(step.node)):
+                    step = Step(node._freeze(), consts, sources, node)
+                steps.append(step)
+
+        snapshot = TreeSnapshot(revision, tuple(steps))
+        if in_batch or self.revision != revision:
+            # The batch may still be rolled back, or the tree was edited
+            # meanwhile, don't keep it.
+            return snapshot
+        self._snapshot = snapshot
+        return snapshot
+
+    def execute(self, cache: Optional[DiskCache] = None) -> None:
         """
         Computes each socket's value.
+        Same as evaluating ``snapshot()`` and storing the values in the sockets.
+
+        :param cache: If given, nodes whose outputs are stored in the
+            cache are not executed, and new outputs are stored.
         """
+        ctx = self.snapshot().evaluate(cache=cache)
+        inputs = ctx.inputs
+        outputs = ctx.outputs
         for node in self.nodes:
-            node.computed = False
-            for inp in node.inputs:
-                inp.computed = False
-            for out in node.outputs:
-                out.computed = False
-
-        for i, node in enumerate(self.nodes):
-            if not node.computed:
-                self._exe_node(i)
+            id_num = node.id_num
+            if id_num in inputs:
+                for inp, v in zip(node.inputs, inputs[id_num]):
+                    inp.value = v
+            for out, v in zip(node.outputs, outputs[id_num]):
+                out.value = v
+            node.computed = True
@@ -0,0 +1,267 @@
+#
+#  ngcf
+#  Node-based general computing framework.
+#  Copyright Patrick Huang 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+__all__ = (
+    "TreeServer",
+    "send_request",
+)
+
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from .nodes import NodeTree
+from .snapshot import TreeSnapshot
+from .utils import reload_nodes
+
+Overrides = Sequence[Tuple[int, int, Any]]
+Outputs = Dict[int, Sequence[Any]]
+
+
+class TreeServer:
+    """
+    Long running executor for many node trees.
+
+    Trees are loaded by name on first use and kept as snapshots in a
+    least recently used cache. Requests run on a worker pool, and any
+    number of them can evaluate the same snapshot at once.
+    A tree is snapshotted again when its revision changes, e.g. after
+    ``reload()``.
+    """
+    max_trees: int
+
+    def __init__(self, loader: Callable[[str], NodeTree], max_trees: int = 64,
+            workers: int = 4) -> None:
+        """
+        :param loader: Called with a tree name, returns a new tree.
+        :param max_trees: Number of trees kept loaded.
+        :param workers: Number of worker threads.
+        """
+        self.max_trees = max_trees
+        self._loader = loader
+        self._trees: "OrderedDict[str, Tuple[NodeTree, TreeSnapshot, threading.Lock]]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._reloads = 0
+        self._pool = ThreadPoolExecutor(workers)
+        self._server: Optional[socketserver.BaseServer] = None
+
+    def run(self, name: str, overrides: Overrides = ()) -> Outputs:
+        """
+        Execute a tree and wait for the result.
+
+        :param name: Tree name passed to the loader.
+        :param overrides: ``(node_id, socket_num, value)`` for each input
+            whose ``gui_value`` is replaced for this request only.
+        :return: Output values of each node, by node ID.
+        """
+        snapshot = self._get(name)
+        replaced = {}
+        for node_id, socket_num, value in overrides:
+            step = snapshot.step(node_id)
+            if step is None:
+                raise ValueError(f"No node with ID {node_id}")
+            if not 0 <= socket_num < len(step.consts):
+                raise ValueError(f"Node {node_id} has no input {socket_num}")
+            replaced[(node_id, socket_num)] = value
+
+        return snapshot.evaluate(replaced).outputs
+
+    def submit(self, name: str, overrides: Overrides = ()) -> Future:
+        """
+        Queue a request on the worker pool.
+        Same arguments as ``run()``.
+        """
+        return self._pool.submit(self.run, name, overrides)
+
+    def serve(self, path: str) -> None:
+        """
+        Accept requests on a Unix socket until ``shutdown()`` is called.
+
+        Each request is one line of JSON:
+        ``{"tree": name, "inputs": [[node_id, socket_num, value], ...]}``.
+        Each response is one line of JSON:
+        ``{"outputs": {node_id: [value, ...], ...}}`` or ``{"error": message}``.
+
+        :param path: Socket path.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                        outputs = server.submit(request["tree"], request.get("inputs", ())).result()
+                        response = {"outputs": outputs}
+                    except Exception as e:
+                        response = {"error": f"{type(e).__name__}: {e}"}
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        _remove_stale_socket(path)
+        self._server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        self._server.daemon_threads = True
+        try:
+            with self._server:
+                self._server.serve_forever()
+        finally:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def loaded_trees(self) -> List[NodeTree]:
+        """
+        Get the trees currently loaded.
+        """
+        with self._lock:
+            return [tree for tree, _, _ in self._trees.values()]
+
+    def reload(self, module: ModuleType) -> ModuleType:
+        """
+        Reload a module of nodes with ``reload_nodes()`` and switch the
+        loaded trees to the new classes. Requests which need a new
+        snapshot of a tree wait until it is updated.
+
+        :param module: Module with a ``register()`` function.
+        :return: The reloaded module.
+        """
+        with self._lock:
+            self._reloads += 1
+            entries = list(self._trees.values())
+
+        try:
+            with contextlib.ExitStack() as stack:
+                for _, _, tree_lock in entries:
+                    stack.enter_context(tree_lock)
+                return reload_nodes(module, [tree for tree, _, _ in entries])
+        finally:
+            # Trees loaded while the module was being reloaded are
+            # loaded again.
+            with self._lock:
+                self._reloads += 1
+
+    def shutdown(self) -> None:
+        """
+        Stop ``serve()`` and the worker pool.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+        self._pool.shutdown()
+
+    def _get(self, name: str) -> TreeSnapshot:
+        """
+        Get a loaded tree's snapshot, loading it if needed.
+        Loading and snapshotting happen outside the server lock, so
+        they don't hold up requests for other trees.
+        """
+        with self._lock:
+            entry = self._trees.get(name)
+            if entry is not None:
+                self._trees.move_to_end(name)
+            else:
+                future = self._loading.get(name)
+                loading = future is None
+                if loading:
+                    future = self._loading[name] = Future()
+
+        if entry is not None:
+            tree, snapshot, tree_lock = entry
+            if snapshot.revision == tree.revision:
+                return snapshot
+            with tree_lock:
+                snapshot = tree.snapshot()
+            with self._lock:
+                if name in self._trees:
+                    self._trees[name] = (tree, snapshot, tree_lock)
+            return snapshot
+
+        if not loading:
+            return future.result()
+
+        try:
+            while True:
+                reloads = self._reloads
+                tree = self._loader(name)
+                snapshot = tree.snapshot()
+                with self._lock:
+                    # A tree loaded while reload() ran may hold the old
+                    # classes, load it again.
+                    if reloads == self._reloads:
+                        del self._loading[name]
+                        self._trees[name] = (tree, snapshot, threading.Lock())
+                        if len(self._trees) > self.max_trees:
+                            self._trees.popitem(last=False)
+                        break
+        except BaseException as e:
+            with self._lock:
+                del self._loading[name]
+            future.set_exception(e)
+            raise
+
+        future.set_result(snapshot)
+        return snapshot
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Remove a socket file left by a server that is no longer running.
+
+    :raises OSError: If a server is still listening on it.
+    """
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(f"A server is already listening on {path}")
+
+
+def send_request(path: str, tree: str, overrides: Overrides = ()) -> Outputs:
+    """
+    Send one request to a ``TreeServer`` listening on a Unix socket.
+
+    :param path: Socket path.
+    :param tree: Tree name.
+    :param overrides: Same as in ``TreeServer.run()``.
+    :return: Output values of each node, by node ID.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps({"tree": tree, "inputs": list(overrides)}).encode() + b"\n")
+        with sock.makefile("rb") as file:
+            response = json.loads(file.readline())
+
+    if "error" in response:
+        raise ValueError(response["error"])
+    return {int(k): tuple(v) for k, v in response["outputs"].items()}
@@ -0,0 +1,165 @@
+#
+#  ngcf
+#  Node-based general computing framework.
+#  Copyright Patrick Huang 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+__all__ = (
+    "TreeSnapshot",
+    "EvalContext",
+)
+
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
+from .cache import DiskCache
+
+if TYPE_CHECKING:
+    from .nodes import Node
+
+
+def _convert(socket, value):
+    return socket.convert(value)
+
+
+def _key(node, consts, sources, keys):
+    """
+    Cache key of a node, given the keys of the nodes before it.
+    """
+    key_inputs = []
+    for const, source in zip(consts, sources):
+        if source is None:
+            key_inputs.append(const)
+        else:
+            key_inputs.append((keys[source[0]], source[1]))
+    return DiskCache.key(node, key_inputs)
+
+
+class Step(NamedTuple):
+    """
+    One node in a snapshot.
+
+    * ``node``: Copy of the node taken with the snapshot.
+    * ``consts``: Input values of unconnected inputs, None for connected ones.
+    * ``sources``: ``(node_id, socket_num)`` of connected inputs, None
+      for unconnected ones.
+    * ``origin``: The node in the tree. Only used to share steps
+      between snapshots, never evaluated.
+    """
+    node: "Node"
+    consts: Tuple[Any, ...]
+    sources: Tuple[Optional[Tuple[int, int]], ...]
+    origin: "Node"
+
+
+class EvalContext:
+    """
+    Values computed by one evaluation of a ``TreeSnapshot``.
+    """
+    inputs: Dict[int, List[Any]]
+    outputs: Dict[int, List[Any]]
+
+    def __init__(self):
+        self.inputs = {}
+        self.outputs = {}
+
+    def get(self, node_id: int, socket_num: int) -> Any:
+        """
+        Get an output value.
+        """
+        return self.outputs[node_id][socket_num]
+
+
+class TreeSnapshot:
+    """
+    Immutable state of a node tree, from ``NodeTree.snapshot()``.
+
+    Values computed while evaluating are stored in an ``EvalContext``,
+    not on the sockets, so any number of threads can evaluate one
+    snapshot at once while the tree keeps being edited.
+    """
+    revision: int
+    steps: Tuple[Step, ...]
+
+    def __init__(self, revision: int, steps: Tuple[Step, ...]) -> None:
+        """
+        :param revision: Tree revision the snapshot was taken at.
+        :param steps: Nodes in execution order.
+        """
+        self.revision = revision
+        self.steps = steps
+        self._by_id = {step.node.id_num: step for step in steps}
+        self._keys: Optional[Dict[int, str]] = None
+
+    def step(self, node_id: int) -> Optional[Step]:
+        """
+        Get a node's step, or None if the node isn't in the snapshot.
+        """
+        return self._by_id.get(node_id)
+
+    def cache_keys(self) -> Dict[int, str]:
+        """
+        Get each node's cache key when evaluated without overrides.
+        """
+        if self._keys is None:
+            keys = {}
+            for node, consts, sources, _ in self.steps:
+                keys[node.id_num] = _key(node, consts, sources, keys)
+            self._keys = keys
+        return self._keys
+
+    def evaluate(self, overrides: Optional[Dict[Tuple[int, int], Any]] = None,
+            cache: Optional[DiskCache] = None) -> EvalContext:
+        """
+        Compute each node's outputs.
+
+        :param overrides: ``{(node_id, socket_num): value}`` replacing
+            unconnected input values for this evaluation only.
+        :param cache: Disk cache to read and store outputs.
+        """
+        by_node = {}
+        if overrides:
+            for (node_id, num), value in overrides.items():
+                by_node.setdefault(node_id, {})[num] = value
+
+        ctx = EvalContext()
+        inputs = ctx.inputs
+        outputs = ctx.outputs
+        keys = {}
+        for node, consts, sources, _ in self.steps:
+            node_id = node.id_num
+            if by_node and node_id in by_node:
+                replaced = by_node[node_id]
+                consts = tuple([replaced.get(i, v) for i, v in enumerate(consts)])
+
+            values = None
+            if cache is not None:
+                key = keys[node_id] = _key(node, consts, sources, keys)
+                values = cache.get(key)
+
+            if values is None:
+                args = list(consts)
+                for i, source in enumerate(sources):
+                    if source is not None:
+                        args[i] = node.inputs[i].convert(outputs[source[0]][source[1]])
+                inputs[node_id] = args
+
+                values = node.execute(*args) if node.pass_values else node._run(args)
+                assert len(values) == len(node.outputs)
+                if cache is not None:
+                    cache.set(key, values)
+
+            outputs[node_id] = list(map(_convert, node.outputs, values))
+
+        return ctx
@@ -36,7 +36,6 @@ class Socket:
     # Updated by the node tree and/or GUI
     value: Any
     gui_value: Any
-    computed: bool
     connection: Union[None, Tuple[int, int]]
 
     def __init__(self):
@@ -48,8 +47,22 @@ class Socket:
         self.gui_value = self.default
 
     def set_value(self, value: Any) -> None:
-        self.value = value
-        self.gui_value = value
+        self.value = self.convert(value)
+        self.gui_value = self.value
+
+    def convert(self, value: Any) -> Any:
+        """
+        Convert a value to one this socket can hold.
+        Doesn't change the socket.
+        """
+        return value
+
+    def accepts(self, other: "Socket") -> bool:
+        """
+        Whether an output socket can be connected to this input socket.
+        By default, only sockets of the same type can be connected.
+        """
+        return isinstance(other, type(self))
 
 
 class SocketBool(Socket):
@@ -75,7 +88,10 @@ class SocketInt(Socket):
         super().__init__()
 
     def set_value(self, value: int) -> None:
-        self.value = max(min(value, self.max), self.min)
+        self.value = self.convert(value)
+
+    def convert(self, value: int) -> int:
+        return max(min(value, self.max), self.min)
 
 
 class SocketFloat(Socket):
@@ -92,7 +108,10 @@ class SocketFloat(Socket):
         super().__init__()
 
     def set_value(self, value: float) -> None:
-        self.value = max(min(value, self.max), self.min)
+        self.value = self.convert(value)
+
+    def convert(self, value: float) -> float:
+        return max(min(value, self.max), self.min)
 
 
 class SocketStr(Socket):
@@ -107,4 +126,7 @@ class SocketStr(Socket):
         super().__init__()
 
     def set_value(self, value: str) -> None:
-        self.value = value[:self.max_len]
+        self.value = self.convert(value)
+
+    def convert(self, value: str) -> str:
+        return value[:self.max_len]
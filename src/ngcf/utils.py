@@ -19,11 +19,15 @@
 
 __all__ = (
     "register_node",
+    "unregister_node",
     "available_nodes",
+    "reload_nodes",
 )
 
-from typing import List, Type
-from .nodes import Node
+import importlib
+from types import ModuleType
+from typing import Iterable, List, Type
+from .nodes import Node, NodeTree
 
 _available_nodes: List[Type[Node]] = []
 
@@ -35,14 +39,58 @@ def register_node(node: Type[Node]) -> None:
     import ngcf
     name = node().__class__.__name__
 
+    node._build_input_map()
     _available_nodes.append(node)
     if not hasattr(ngcf, name):
         setattr(ngcf, name, node)
     else:
         raise ValueError(f"Failed to register {name}: Name already exists.")
 
+def unregister_node(node: Type[Node]) -> None:
+    """
+    Remove a node added with ``register_node``.
+    """
+    import ngcf
+    _available_nodes.remove(node)
+    if getattr(ngcf, node.__name__, None) is node:
+        delattr(ngcf, node.__name__)
+
 def available_nodes() -> List[Type[Node]]:
     """
     Returns all available nodes.
     """
     return _available_nodes
+
+def reload_nodes(module: ModuleType, trees: Iterable[NodeTree] = ()) -> ModuleType:
+    """
+    Re-import a module of nodes without restarting.
+
+    The module's nodes are unregistered, the module is reloaded and its
+    ``register()`` function is called. Nodes in ``trees`` whose class
+    was replaced are switched to the new class, keeping their socket
+    values and connections. For trees in a ``TreeServer`` use
+    ``TreeServer.reload()`` instead.
+
+    :param module: Module with a ``register()`` function, like ``default_nodes``.
+    :param trees: Trees to update.
+    :return: The reloaded module.
+    """
+    old = [cls for cls in _available_nodes if cls.__module__ == module.__name__]
+    for cls in old:
+        unregister_node(cls)
+
+    try:
+        module = importlib.reload(module)
+        module.register()
+    except BaseException:
+        for cls in [cls for cls in _available_nodes if cls.__module__ == module.__name__]:
+            unregister_node(cls)
+        for cls in old:
+            register_node(cls)
+        raise
+
+    new = {cls.__name__: cls for cls in _available_nodes if cls.__module__ == module.__name__}
+    classes = {cls: new[cls.__name__] for cls in old if cls.__name__ in new}
+    for tree in trees:
+        tree.replace_classes(classes)
+    return module
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+import ngcf
+from conftest import SRC
+
+CHAIN = """
+import sys
+import ngcf
+
+calls = []
+
+class NodeInc(ngcf.Node):
+    inputs = (ngcf.SocketInt(name="A"),)
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, a):
+        calls.append(a)
+        return (a + 1,)
+
+tree = ngcf.NodeTree()
+with tree.batch():
+    ids = tree.add_nodes(NodeInc() for _ in range(10))
+    tree.connect_many((ids[i], 0, ids[i+1], 0) for i in range(9))
+tree.get_node_by_id(ids[0]).inputs[0].gui_value = int(sys.argv[2])
+tree.execute(cache=ngcf.DiskCache(sys.argv[1]))
+print(len(calls), tree.get_node_by_id(ids[-1]).outputs[0].value)
+"""
+
+
+def run_chain(path, start):
+    env = dict(os.environ, PYTHONPATH=SRC)
+    out = subprocess.run([sys.executable, "-c", CHAIN, str(path), str(start)],
+        env=env, capture_output=True, text=True, check=True).stdout
+    return tuple(map(int, out.split()))
+
+
+def test_hit_across_processes(tmp_path):
+    assert run_chain(tmp_path, 0) == (10, 10)
+    assert run_chain(tmp_path, 0) == (0, 10)
+
+
+def test_miss_on_changed_input(tmp_path):
+    assert run_chain(tmp_path, 0) == (10, 10)
+    assert run_chain(tmp_path, 5) == (10, 15)
+    assert run_chain(tmp_path, 5) == (0, 15)
+
+
+def test_get_missing(tmp_path):
+    cache = ngcf.DiskCache(str(tmp_path))
+    assert cache.get("0" * 64) is None
+    cache.set("0" * 64, (1, "a"))
+    assert cache.get("0" * 64) == (1, "a")
+
+
+def test_get_unloadable(tmp_path):
+    cache = ngcf.DiskCache(str(tmp_path))
+    key = "1" * 64
+    cache.set(key, (1,))
+    # An entry holding an instance of a class whose module no longer exists.
+    with open(cache._file(key), "wb") as file:
+        file.write(b"cngcf_removed_module\nNodeGone\n.")
+    assert cache.get(key) is None
+    with open(cache._file(key), "wb") as file:
+        file.write(b"\x80\x04garbage")
+    assert cache.get(key) is None
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def test_evict_to_low_water(tmp_path):
+    cache = ngcf.DiskCache(str(tmp_path), max_size=10000)
+    for i in range(200):
+        cache.set(f"{i:064x}", ("x" * 100,))
+        assert dir_size(tmp_path) <= cache.max_size + 1000
+
+    cache.max_size = 5000
+    cache.evict()
+    assert dir_size(tmp_path) <= 5000 * cache.low_water
+    # The most recent entries are kept.
+    assert cache.get(f"{199:064x}") is not None
+
+
+def test_shared_directory_bounded(tmp_path):
+    caches = [ngcf.DiskCache(str(tmp_path), max_size=10000) for _ in range(4)]
+    for i in range(400):
+        caches[i % 4].set(f"{i:064x}", ("x" * 100,))
+    # Each process may write up to 10% of max_size between scans.
+    assert dir_size(tmp_path) <= 10000 * 1.4 + 1000
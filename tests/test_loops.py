@@ -0,0 +1,152 @@
+import tempfile
+
+import pytest
+
+import ngcf
+from test_nodes import NodeAnd
+from test_snapshot import NodeInc
+
+
+class NodeNot(ngcf.Node):
+    inputs = (ngcf.SocketBool(name="A"),)
+    outputs = (ngcf.SocketBool(name="Output"),)
+    pass_values = True
+
+    def execute(self, a):
+        return (not a,)
+
+
+class NodeAtLeast(ngcf.Node):
+    inputs = (
+        ngcf.SocketInt(name="A"),
+        ngcf.SocketInt(name="Limit"),
+    )
+    outputs = (
+        ngcf.SocketInt(name="A"),
+        ngcf.SocketBool(name="Done"),
+    )
+
+    def execute(self):
+        return (self.get("A"), self.get("A") >= self.get("Limit"))
+
+
+def counter(limit):
+    """Body adding 1 to its state until it reaches limit."""
+    body = ngcf.NodeTree()
+    inc, check = body.add_nodes([NodeInc(), NodeAtLeast()])
+    body.make_connection(inc, 0, check, 0)
+    body.get_node_by_id(check).inputs[1].gui_value = limit
+    return body, inc, check
+
+
+def run(node, *values):
+    tree = ngcf.NodeTree()
+    id_num = tree.add_node(node)
+    for inp, value in zip(node.inputs, values):
+        inp.gui_value = value
+    tree.execute()
+    return [out.value for out in tree.get_node_by_id(id_num).outputs]
+
+
+def test_state():
+    body, inc, check = counter(100)
+    repeat = ngcf.NodeRepeat(body, [((inc, 0), (check, 0))])
+    assert run(repeat, 10, 5) == [15, 10]
+    assert run(repeat, 0, 5) == [5, 0]
+
+
+def test_early_exit():
+    body, inc, check = counter(3)
+    repeat = ngcf.NodeRepeat(body, [((inc, 0), (check, 0))], stop=(check, 1))
+    assert run(repeat, 10, 0) == [3, 3]
+
+
+def test_index():
+    body = ngcf.NodeTree()
+    node = body.add_node(NodeInc())
+    repeat = ngcf.NodeRepeat(body, [], index=(node, 0))
+    tree = ngcf.NodeTree()
+    id_num = tree.add_node(repeat)
+    tree.get_node_by_id(id_num).inputs[0].gui_value = 4
+    assert tree.snapshot().evaluate().outputs[id_num] == [4]
+
+
+def test_get_state_input():
+    body = ngcf.NodeTree()
+    node = body.add_node(NodeNot())
+    repeat = ngcf.NodeRepeat(body, [((node, 0), (node, 0))])
+    repeat.inputs[1].value = True
+    assert repeat.get("Iterations") == 1
+    assert repeat.get("A") is True
+
+
+def test_connected_state_rejected():
+    body = ngcf.NodeTree()
+    a, b = body.add_nodes([NodeNot(), NodeNot()])
+    body.make_connection(a, 0, b, 0)
+    with pytest.raises(ValueError):
+        ngcf.NodeRepeat(body, [((b, 0), (b, 0))])
+    with pytest.raises(ValueError):
+        ngcf.NodeRepeat(body, [], index=(b, 0))
+
+
+def test_parent_snapshot_isolated_from_body():
+    body = ngcf.NodeTree()
+    node = body.add_node(NodeAnd())
+    body.get_node_by_id(node).inputs[1].gui_value = True
+    tree = ngcf.NodeTree()
+    id_num = tree.add_node(ngcf.NodeRepeat(body, [((node, 0), (node, 0))]))
+    tree.get_node_by_id(id_num).inputs[1].gui_value = True
+
+    snapshot = tree.snapshot()
+    assert snapshot.evaluate().outputs[id_num] == [True, 1]
+    body.get_node_by_id(node).inputs[1].gui_value = False
+    assert snapshot.evaluate().outputs[id_num] == [True, 1]
+    assert tree.snapshot().evaluate().outputs[id_num] == [False, 1]
+
+
+def test_cache_sees_body_edits():
+    body, inc, check = counter(100)
+    tree = ngcf.NodeTree()
+    id_num = tree.add_node(ngcf.NodeRepeat(body, [((inc, 0), (check, 0))], stop=(check, 1)))
+    tree.get_node_by_id(id_num).inputs[0].gui_value = 10
+    cache = ngcf.DiskCache(tempfile.mkdtemp())
+
+    tree.execute(cache=cache)
+    assert tree.get_node_by_id(id_num).outputs[0].value == 10
+    body.get_node_by_id(check).inputs[1].gui_value = 4
+    tree.execute(cache=cache)
+    assert tree.get_node_by_id(id_num).outputs[0].value == 4
+
+
+class NodeStepInc(ngcf.Node):
+    inputs = (ngcf.SocketInt(name="A"),)
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, a):
+        return (a + 1,)
+
+
+class NodeStepIncChanged(NodeStepInc):
+    """NodeStepInc as if its module was edited and reloaded."""
+    def execute(self, a):
+        return (a + 100,)
+
+
+NodeStepIncChanged.__qualname__ = NodeStepInc.__qualname__
+
+
+def test_cache_sees_replaced_body_class():
+    body = ngcf.NodeTree()
+    node = body.add_node(NodeStepInc())
+    tree = ngcf.NodeTree()
+    id_num = tree.add_node(ngcf.NodeRepeat(body, [((node, 0), (node, 0))]))
+    tree.get_node_by_id(id_num).inputs[0].gui_value = 3
+    cache = ngcf.DiskCache(tempfile.mkdtemp())
+
+    tree.execute(cache=cache)
+    assert tree.get_node_by_id(id_num).outputs[0].value == 3
+    body.replace_classes({NodeStepInc: NodeStepIncChanged})
+    tree.execute(cache=cache)
+    assert tree.get_node_by_id(id_num).outputs[0].value == 300
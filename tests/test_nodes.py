@@ -0,0 +1,156 @@
+import pytest
+
+import ngcf
+
+
+class NodeAnd(ngcf.Node):
+    inputs = (
+        ngcf.SocketBool(name="A"),
+        ngcf.SocketBool(name="B"),
+    )
+    outputs = (
+        ngcf.SocketBool(name="Output"),
+    )
+    pass_values = True
+
+    def execute(self, a, b):
+        return (a and b,)
+
+
+class NodeInt(ngcf.Node):
+    inputs = (ngcf.SocketInt(name="A"),)
+    outputs = (ngcf.SocketInt(name="Out"),)
+
+    def execute(self):
+        return (self.get("A"),)
+
+
+def chain(tree, n):
+    with tree.batch():
+        ids = tree.add_nodes(NodeAnd() for _ in range(n))
+        tree.connect_many((ids[i], 0, ids[i+1], 0) for i in range(n-1))
+    return ids
+
+
+def links(tree):
+    return [(node.id_num, [inp.connection for inp in node.inputs]) for node in tree.nodes]
+
+
+def test_instances_have_own_sockets():
+    a, b = NodeAnd(), NodeAnd()
+    assert a.inputs[0] is not b.inputs[0]
+    assert a.inputs[0] is not NodeAnd.inputs[0]
+
+
+def test_get_by_name():
+    node = NodeInt()
+    node.inputs[0].value = 3
+    assert node.get("A") == 3
+    with pytest.raises(ValueError):
+        node.get("B")
+
+
+def test_execute_chain():
+    tree = ngcf.NodeTree()
+    ids = chain(tree, 5)
+    for node in tree.nodes:
+        node.inputs[0].gui_value = node.inputs[1].gui_value = True
+    tree.execute()
+    assert tree.get_node_by_id(ids[-1]).outputs[0].value is True
+
+    tree.get_node_by_id(ids[2]).inputs[1].gui_value = False
+    tree.execute()
+    assert tree.get_node_by_id(ids[-1]).outputs[0].value is False
+
+
+def test_batch_rollback_on_cycle():
+    tree = ngcf.NodeTree()
+    ids = chain(tree, 3)
+    before = links(tree)
+    revision = tree.revision
+
+    with pytest.raises(ValueError):
+        with tree.batch():
+            tree.add_node(NodeAnd())
+            tree.make_connection(ids[2], 0, ids[0], 0)
+    assert links(tree) == before
+    assert tree.revision == revision
+
+
+def test_cycle_checks():
+    # One at a time, then in a batch larger than max_cycle_checks.
+    for n in (1, ngcf.NodeTree.max_cycle_checks + 1):
+        tree = ngcf.NodeTree()
+        ids = chain(tree, 40)
+        extra = tree.add_nodes(NodeAnd() for _ in range(n-1))
+        before = links(tree)
+        with pytest.raises(ValueError):
+            tree.connect_many([(e, 0, i, 1) for e, i in zip(extra, ids[1:])] + [(ids[-1], 0, ids[0], 1)])
+        assert links(tree) == before
+
+    # A connection undone later in the batch isn't a cycle.
+    with tree.batch():
+        tree.make_connection(ids[-1], 0, ids[0], 1)
+        tree.rm_connection(ids[-1], 0, ids[0], 1)
+    assert links(tree) == before
+
+
+def test_batch_rollback_on_exception():
+    tree = ngcf.NodeTree()
+    ids = chain(tree, 3)
+    before = links(tree)
+    with pytest.raises(RuntimeError):
+        with tree.batch():
+            tree.rm_node(ids[1])
+            raise RuntimeError
+    assert links(tree) == before
+
+
+def test_type_check():
+    tree = ngcf.NodeTree()
+    a, b = tree.add_nodes([NodeInt(), NodeAnd()])
+    with pytest.raises(ValueError):
+        tree.make_connection(a, 0, b, 0)
+
+
+def test_undo_redo():
+    tree = ngcf.NodeTree()
+    ids = chain(tree, 3)
+    full = links(tree)
+
+    tree.rm_node(ids[1])
+    removed = links(tree)
+    assert [i for i, _ in removed] == [ids[0], ids[2]]
+    assert tree.get_node_by_id(ids[0]).outputs[0].connection is None
+
+    assert tree.undo()
+    assert links(tree) == full
+    assert tree.redo()
+    assert links(tree) == removed
+    assert tree.undo()
+    assert tree.undo()
+    assert tree.nodes == []
+    assert not tree.undo()
+    assert tree.redo()
+    assert links(tree) == full
+
+
+def test_undo_depth():
+    tree = ngcf.NodeTree(max_undo=2)
+    for _ in range(5):
+        tree.add_node(NodeAnd())
+    assert tree.undo()
+    assert tree.undo()
+    assert not tree.undo()
+    assert len(tree.nodes) == 3
+
+
+def test_no_history():
+    tree = ngcf.NodeTree(max_undo=0)
+    chain(tree, 3)
+    assert not tree.undo()
+
+    tree = ngcf.NodeTree()
+    chain(tree, 3)
+    tree.clear_history()
+    assert not tree.undo()
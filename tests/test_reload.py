@@ -0,0 +1,239 @@
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+import ngcf
+from conftest import SRC
+from test_nodes import NodeAnd, NodeInt
+from test_snapshot import NodeInc
+
+KEY = """
+import ngcf
+
+class NodeCheck(ngcf.Node):
+    inputs = (ngcf.SocketStr(name="A"),)
+    outputs = (ngcf.SocketBool(name="Out"),)
+    pass_values = True
+
+    def execute(self, a):
+        return (a in {"alpha", "beta", "gamma", "delta"},)
+
+print(ngcf.DiskCache.key(NodeCheck(), [frozenset({"x", "y", "z"}), {"k": {"p", "q"}}]))
+"""
+
+
+def test_key_stable_across_hash_seeds():
+    keys = set()
+    for seed in ("1", "2", "3"):
+        env = dict(os.environ, PYTHONPATH=SRC, PYTHONHASHSEED=seed)
+        out = subprocess.run([sys.executable, "-c", KEY], env=env,
+            capture_output=True, text=True, check=True).stdout
+        keys.add(out.strip())
+    assert len(keys) == 1
+
+
+def test_key_distinguishes_containers():
+    node = NodeInc()
+    values = [
+        {"a": 1}, ("dict", (("a", 1),)),
+        frozenset({1}), {1}, ("frozenset", (1,)), (1,), [1],
+    ]
+    keys = {ngcf.DiskCache.key(node, [value]) for value in values}
+    assert len(keys) == len(values)
+
+
+class NodeIncRenamed(ngcf.Node):
+    """NodeInc with an extra input before A."""
+    inputs = (
+        ngcf.SocketInt(name="B"),
+        ngcf.SocketInt(name="A"),
+    )
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, b, a):
+        return (a + 100,)
+
+
+def test_replace_classes_keeps_connections():
+    tree = ngcf.NodeTree()
+    a, b, c = tree.add_nodes([NodeInc(), NodeInc(), NodeInc()])
+    tree.connect_many([(a, 0, b, 0), (b, 0, c, 0)])
+    tree.get_node_by_id(a).inputs[0].gui_value = 5
+
+    assert tree.replace_classes({NodeInc: NodeIncRenamed}) == [a, b, c]
+    node = tree.get_node_by_id(b)
+    assert type(node) is NodeIncRenamed
+    assert [inp.connection for inp in node.inputs] == [None, (a, 0)]
+    assert tree.get_node_by_id(a).outputs[0].connection == (b, 1)
+    assert tree.get_node_by_id(a).inputs[1].gui_value == 5
+    tree.execute()
+    assert tree.get_node_by_id(c).outputs[0].value == 305
+
+
+def test_replace_classes_drops_incompatible():
+    tree = ngcf.NodeTree()
+    a, b = tree.add_nodes([NodeInt(), NodeInt()])
+    tree.make_connection(a, 0, b, 0)
+    tree.replace_classes({NodeInt: NodeAnd})
+    assert tree.get_node_by_id(a).outputs[0].connection is None
+    assert tree.get_node_by_id(b).inputs[0].connection is None
+    assert not tree.undo()
+
+
+MODULE = """
+import ngcf
+
+class NodeReloadInc(ngcf.Node):
+    inputs = (ngcf.SocketInt(name="A"),)
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, a):
+        return (a + {step},)
+
+class NodeReloadDouble(ngcf.Node):
+    inputs = (ngcf.SocketInt(name="A"),)
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, a):
+        return (a * 2,)
+
+def register():
+    ngcf.register_node(NodeReloadInc)
+    ngcf.register_node(NodeReloadDouble)
+"""
+
+
+def test_reload_nodes(tmp_path, monkeypatch):
+    path = tmp_path / "reload_nodes_mod.py"
+    path.write_text(MODULE.format(step=1))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module("reload_nodes_mod")
+    module.register()
+    try:
+        tree = ngcf.NodeTree()
+        a, b, c = tree.add_nodes([module.NodeReloadDouble(), module.NodeReloadInc(),
+            module.NodeReloadDouble()])
+        tree.connect_many([(a, 0, b, 0), (b, 0, c, 0)])
+        tree.get_node_by_id(a).inputs[0].gui_value = 5
+        cache = ngcf.DiskCache(tempfile.mkdtemp())
+        tree.execute(cache=cache)
+        assert tree.get_node_by_id(c).outputs[0].value == 22
+
+        path.write_text(MODULE.format(step=100))
+        importlib.invalidate_caches()
+        # Make sure the changed source is not skipped for having the same mtime.
+        os.utime(path, (0, 0))
+        for pyc in (tmp_path / "__pycache__").glob("*"):
+            pyc.unlink()
+        module = ngcf.reload_nodes(module, [tree])
+        assert type(tree.get_node_by_id(b)) is module.NodeReloadInc
+        assert ngcf.NodeReloadInc is module.NodeReloadInc
+
+        written = []
+        set_entry = cache.set
+        monkeypatch.setattr(cache, "set", lambda key, values: (written.append(key), set_entry(key, values)))
+        tree.execute(cache=cache)
+        assert tree.get_node_by_id(c).outputs[0].value == 220
+        # The unchanged first node is read from the cache.
+        assert len(written) == 2
+
+        path.write_text("syntax error(")
+        for pyc in (tmp_path / "__pycache__").glob("*"):
+            pyc.unlink()
+        try:
+            ngcf.reload_nodes(module, [tree])
+        except SyntaxError:
+            pass
+        assert ngcf.NodeReloadInc is module.NodeReloadInc
+    finally:
+        for cls in list(ngcf.available_nodes()):
+            if cls.__module__ == "reload_nodes_mod":
+                ngcf.unregister_node(cls)
+
+
+SERVER_MODULE = """
+import ngcf
+
+class NodeServerInc(ngcf.Node):
+    inputs = {inputs}
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, *args):
+        return (args[-1] + {step},)
+
+def register():
+    ngcf.register_node(NodeServerInc)
+"""
+SERVER_VERSIONS = [
+    SERVER_MODULE.format(inputs='(ngcf.SocketInt(name="A"),)', step=1),
+    # A socket is added before A, so a snapshot mixing the new class with
+    # the old sockets connects the wrong input.
+    SERVER_MODULE.format(inputs='(ngcf.SocketInt(name="B", default=1000), ngcf.SocketInt(name="A"))',
+        step=100),
+]
+
+
+def write_module(path, text):
+    path.write_text(text)
+    importlib.invalidate_caches()
+    os.utime(path, (0, 0))
+    for pyc in (path.parent / "__pycache__").glob("*"):
+        pyc.unlink()
+
+
+def test_server_reload_concurrent(tmp_path, monkeypatch):
+    path = tmp_path / "reload_server_mod.py"
+    write_module(path, SERVER_VERSIONS[0])
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module("reload_server_mod")
+    module.register()
+
+    def load(name):
+        tree = ngcf.NodeTree(max_undo=0)
+        cls = sys.modules["reload_server_mod"].NodeServerInc
+        with tree.batch():
+            ids = tree.add_nodes(cls() for _ in range(10))
+            tree.connect_many((ids[i], 0, ids[i+1], len(cls.inputs) - 1) for i in range(9))
+        return tree
+
+    server = ngcf.TreeServer(load, max_trees=2)
+    stop = threading.Event()
+    results = set()
+    errors = []
+
+    def request(i):
+        while not stop.is_set():
+            try:
+                results.add(server.run(str(i % 3))[9][0])
+            except Exception as e:
+                errors.append(e)
+            i += 1
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for i in range(1, 21):
+            write_module(path, SERVER_VERSIONS[i % 2])
+            module = server.reload(module)
+            assert server.run("0")[9][0] == (10, 1000)[i % 2]
+            for tree in server.loaded_trees():
+                assert all(type(node) is module.NodeServerInc for node in tree.nodes)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        server.shutdown()
+        for cls in list(ngcf.available_nodes()):
+            if cls.__module__ == "reload_server_mod":
+                ngcf.unregister_node(cls)
+
+    assert not errors
+    assert results == {10, 1000}
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+import pytest
+
+import ngcf
+from test_nodes import NodeAnd, chain
+
+
+def load(name):
+    tree = ngcf.NodeTree(max_undo=0)
+    chain(tree, int(name))
+    return tree
+
+
+def start(server, path):
+    thread = threading.Thread(target=server.serve, args=(path,), daemon=True)
+    thread.start()
+    while server._server is None:
+        time.sleep(0.01)
+    return thread
+
+
+def test_run_overrides():
+    server = ngcf.TreeServer(load)
+    outputs = server.run("3", [(0, 0, True), (0, 1, True), (1, 1, True), (2, 1, True)])
+    assert outputs[2][0] is True
+    outputs = server.submit("3", [(0, 0, True)]).result()
+    assert outputs[2][0] is False
+    with pytest.raises(ValueError):
+        server.run("3", [(5, 0, True)])
+    server.shutdown()
+
+
+def test_serve_and_restart(tmp_path):
+    path = str(tmp_path / "ngcf.sock")
+    server = ngcf.TreeServer(load)
+    thread = start(server, path)
+    assert ngcf.send_request(path, "2", [(0, 0, True), (0, 1, True), (1, 1, True)])[1] == (True,)
+    with pytest.raises(ValueError):
+        ngcf.send_request(path, "2", [(9, 0, True)])
+    server.shutdown()
+    thread.join()
+    assert not os.path.exists(path)
+
+    server = ngcf.TreeServer(load)
+    start(server, path)
+    assert ngcf.send_request(path, "2")[1] == (False,)
+    with pytest.raises(OSError):
+        ngcf.TreeServer(load).serve(path)
+    server.shutdown()
+
+
+def test_stale_socket_file(tmp_path):
+    import socket
+    path = str(tmp_path / "ngcf.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.close()
+
+    server = ngcf.TreeServer(load)
+    start(server, path)
+    assert ngcf.send_request(path, "1")[0] == (False,)
+    server.shutdown()
+
+
+def test_slow_load_doesnt_block():
+    release = threading.Event()
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        if name == "slow":
+            release.wait(5)
+            return load("2")
+        return load(name)
+
+    server = ngcf.TreeServer(loader)
+    server.run("1")
+    slow = [server.submit("slow") for _ in range(2)]
+    time.sleep(0.05)
+    assert server.run("1")[0] == [False]
+    assert server.run("3")[2] == [False]
+    release.set()
+    assert [f.result()[1] for f in slow] == [[False], [False]]
+    assert loads.count("slow") == 1
+    server.shutdown()
+
+
+def test_resnapshot_after_edit():
+    server = ngcf.TreeServer(load)
+    server.run("2")
+    tree, = server.loaded_trees()
+    tree.add_node(NodeAnd())
+    assert len(server.run("2")) == 3
+    server.shutdown()
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+import ngcf
+from test_nodes import NodeAnd, NodeInt, chain
+
+
+class NodeInc(ngcf.Node):
+    inputs = (ngcf.SocketInt(name="A"),)
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, a):
+        return (a + 1,)
+
+
+class NodeDec(ngcf.Node):
+    inputs = (ngcf.SocketInt(name="A"),)
+    outputs = (ngcf.SocketInt(name="Out"),)
+    pass_values = True
+
+    def execute(self, a):
+        return (a - 1,)
+
+
+def inc_chain(n):
+    tree = ngcf.NodeTree()
+    with tree.batch():
+        ids = tree.add_nodes(NodeInc() for _ in range(n))
+        tree.connect_many((ids[i], 0, ids[i+1], 0) for i in range(n-1))
+    return tree, ids
+
+
+def test_isolated_from_edits():
+    tree, ids = inc_chain(3)
+    snapshot = tree.snapshot()
+    assert snapshot.evaluate().get(ids[-1], 0) == 3
+
+    tree.get_node_by_id(ids[0]).inputs[0].gui_value = 10
+    tree.rm_connection(ids[1], 0, ids[2], 0)
+    tree.add_node(NodeInc())
+    assert snapshot.evaluate().get(ids[-1], 0) == 3
+    assert tree.snapshot().evaluate().get(ids[-1], 0) == 1
+    assert tree.snapshot().evaluate().get(ids[1], 0) == 12
+
+
+def test_isolated_from_class_replacement():
+    tree, ids = inc_chain(3)
+    snapshot = tree.snapshot()
+    tree.replace_classes({NodeInc: NodeDec})
+    assert snapshot.evaluate().get(ids[-1], 0) == 3
+    assert tree.snapshot().evaluate().get(ids[-1], 0) == -3
+
+
+def test_sockets_untouched():
+    tree, ids = inc_chain(2)
+    tree.snapshot().evaluate({(ids[0], 0): 5})
+    assert all(out.value == 0 for node in tree.nodes for out in node.outputs)
+
+
+def test_shares_unchanged_steps():
+    tree, ids = inc_chain(3)
+    first = tree.snapshot()
+    assert tree.snapshot() is first
+
+    tree.get_node_by_id(ids[0]).inputs[0].gui_value = 4
+    second = tree.snapshot()
+    assert second is not first
+    assert second.steps[0] is not first.steps[0]
+    assert second.steps[1:] == first.steps[1:]
+    assert all(a is b for a, b in zip(second.steps[1:], first.steps[1:]))
+
+
+def test_in_batch():
+    tree = ngcf.NodeTree()
+    chain(tree, 2)
+    tree.execute()
+    with tree.batch():
+        id_num = tree.add_node(NodeAnd())
+        tree.execute()
+        assert tree.snapshot().step(id_num) is not None
+    assert tree.snapshot().step(id_num) is not None
+
+    with pytest.raises(RuntimeError):
+        with tree.batch():
+            other = tree.add_node(NodeAnd())
+            tree.execute()
+            raise RuntimeError
+    assert tree.snapshot().step(other) is None
+    tree.execute()
+
+
+def test_get_style_nodes():
+    tree = ngcf.NodeTree()
+    a, b = tree.add_nodes([NodeInt(), NodeInt()])
+    tree.make_connection(a, 0, b, 0)
+    ctx = tree.snapshot().evaluate({(a, 0): 7})
+    assert ctx.get(b, 0) == 7
+    assert tree.get_node_by_id(a).inputs[0].value == 0
+
+
+def test_concurrent_evaluation():
+    tree, ids = inc_chain(50)
+    snapshot = tree.snapshot()
+    results = {}
+
+    def work(k):
+        for _ in range(20):
+            results[k] = snapshot.evaluate({(ids[0], 0): k}).get(ids[-1], 0)
+            assert results[k] == k + 50
+
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(8)]
+    for thread in threads:
+        thread.start()
+    for _ in range(20):
+        tree.get_node_by_id(ids[0]).inputs[0].gui_value += 1
+        tree.snapshot()
+    for thread in threads:
+        thread.join()
+    assert results == {k: k + 50 for k in range(8)}